@@ -6,8 +6,8 @@ METRICS_SCRIPT="/opt/system-monitor/system_monitor.py"
 
 # Если файл не существует, создаем заголовок
 if [ ! -f "$LOG_FILE" ] || [ ! -s "$LOG_FILE" ]; then
-    python3 "$METRICS_SCRIPT" --format header > "$LOG_FILE"
+    python3 "$METRICS_SCRIPT" --format header --once > "$LOG_FILE"
 fi
 
 # Добавляем новую строку с метриками
-python3 "$METRICS_SCRIPT" --format csv >> "$LOG_FILE"
+python3 "$METRICS_SCRIPT" --format csv --once >> "$LOG_FILE"
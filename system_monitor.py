@@ -5,246 +5,701 @@
 """
 
 import psutil
-import json
+import numpy as np
+import re
 import time
-from datetime import datetime
-import socket
 import argparse
+import functools
+import signal
 import sys
+import threading
 import os
+from collections import namedtuple
+
+# orjson (C-расширение) сериализует на порядок быстрее stdlib json;
+# при его отсутствии прозрачно откатываемся на стандартный модуль.
+# Оба импортируются только когда JSON действительно нужен.
+@functools.lru_cache(maxsize=1)
+def _get_json_dumps():
+    try:
+        import orjson
+        return lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    except ImportError:
+        import json
+        return lambda obj: json.dumps(obj, indent=2)
+
+def _json_dumps(obj):
+    return _get_json_dumps()(obj)
+
+# Интервал между затравочным и рабочим замером CPU для разовых запусков
+CPU_SAMPLE_INTERVAL = 1.0
+
+# Затравочный вызов: cpu_percent(interval=None) считает дельту от предыдущего
+# вызова, поэтому прогреваем внутреннее состояние psutil один раз при импорте.
+# Дальше collect_metrics() получает значения мгновенно, без блокирующего сна.
+psutil.cpu_percent(interval=None, percpu=False)
+psutil.cpu_percent(interval=None, percpu=True)
+
+# Значения, не меняющиеся за время жизни процесса, снимаем один раз;
+# socket импортируется только при первом обращении к имени хоста
+CPU_COUNT = psutil.cpu_count()
+
+@functools.lru_cache(maxsize=1)
+def get_hostname():
+    """Имя хоста (не меняется за время жизни процесса)"""
+    import socket
+    return socket.gethostname()
+
+# Последний замер CPU из фонового потока-сэмплера (режим цикла)
+_cpu_state = {'total': 0.0, 'per_core': []}
+_cpu_lock = threading.Lock()
+_cpu_sampler_started = False
+
+def _cpu_sampler():
+    """Фоновый замер CPU с окном в одну секунду
+
+    Точный cpu_percent требует паузы между двумя чтениями /proc/stat.
+    Выносим ее в отдельный поток: collect_metrics() просто берет
+    последнее готовое значение и не блокируется вовсе.
+    """
+    while True:
+        total = psutil.cpu_percent(interval=1.0, percpu=False)
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
+        with _cpu_lock:
+            _cpu_state['total'] = total
+            _cpu_state['per_core'] = per_core
+
+def start_cpu_sampler():
+    """Запуск фонового потока замера CPU (один раз на процесс)"""
+    global _cpu_sampler_started
+    if not _cpu_sampler_started:
+        threading.Thread(target=_cpu_sampler, daemon=True).start()
+        _cpu_sampler_started = True
+
+# Обратные коэффициенты перевода байтов: умножение быстрее деления
+INV_GB = 1.0 / (1024 ** 3)
+INV_MB = 1.0 / (1024 ** 2)
+
+# Коэффициенты для векторного перевода байтовых метрик collect_metrics():
+# 5 значений в гигабайты (память и swap), 4 в мегабайты (IO и сеть)
+_BYTE_FACTORS = np.array([INV_GB] * 5 + [INV_MB] * 4, dtype=np.float64)
+
+# numba компилирует числовое ядро в машинный код (cache=True сохраняет
+# результат компиляции между запусками); без numba остается чистый numpy.
+# fastmath не включаем: он ломает округление до сотых в _convert_bytes
+try:
+    from numba import njit
+
+    _maybe_njit = njit(cache=True)
+except ImportError:
+    def _maybe_njit(func):
+        return func
+
+@_maybe_njit
+def _convert_bytes(raw, factors):
+    """Перевод массива байтовых значений в GB/MB с округлением до сотых"""
+    out = np.empty_like(raw)
+    np.round(raw * factors, 2, out)
+    return out
+
+# Фиксированная часть схемы метрик: имя колонки -> тип значения.
+# Динамические колонки по дискам достраиваются из таблицы монтирования.
+METRIC_SCHEMA = {
+    'timestamp': str,
+    'hostname': str,
+    'cpu_percent': float,
+    'cpu_count': int,
+    'cpu_freq_current': float,
+    'load_1min': float,
+    'load_5min': float,
+    'load_15min': float,
+    'memory_total_gb': float,
+    'memory_available_gb': float,
+    'memory_used_gb': float,
+    'memory_percent': float,
+    'swap_total_gb': float,
+    'swap_used_gb': float,
+    'swap_percent': float,
+    'disk_io_read_mb': float,
+    'disk_io_write_mb': float,
+    'net_mb_sent': float,
+    'net_mb_recv': float,
+    'process_count': int,
+}
+
+# Специальные файловые системы, не попадающие в метрики
+_SKIP_FSTYPES = frozenset({'tmpfs', 'devtmpfs', 'squashfs', 'overlay', 'proc', 'sysfs', 'cgroup'})
+
+# Виртуальные ФС, не учитываемые в суммарном объеме дисков
+_VIRTUAL_FSTYPES = frozenset({'overlay', 'squashfs'})
+
+# Суффиксы колонок, создаваемых для каждого диска
+DISK_KEY_SUFFIXES = ('total_gb', 'used_gb', 'free_gb', 'percent', 'device', 'fstype')
+
+def _escape_csv(value):
+    """Экранирование одного строкового значения для CSV"""
+    if value is None:
+        return ''
+    value = str(value)
+    return f'"{value}"' if ',' in value else value
+
+def _build_row_formatter(keys, str_keys=(), nullable_keys=()):
+    """Генерация специализированного форматтера строки CSV
+
+    Собирает f-строку под известный набор колонок и компилирует её в
+    lambda: на горячем пути не остаётся ни isinstance-проверок,
+    ни ветвлений по типам — только подстановка значений.
+    """
+    parts = []
+    for key in keys:
+        if key in nullable_keys:
+            parts.append("{'' if m[%r] is None else m[%r]}" % (key, key))
+        elif key in str_keys:
+            parts.append("{_escape_csv(m[%r])}" % key)
+        else:
+            parts.append("{m[%r]}" % key)
+    return eval('lambda m: f"' + ','.join(parts) + '"')
+
+# Таблица готовых форматтеров целой строки, по одному на набор колонок.
+# Пересобирается только при появлении/исчезновении точек монтирования.
+_row_formatters = {}
+
+def _get_row_formatter(keys):
+    """Форматтер строки CSV для данного набора колонок (из таблицы)
+
+    Строковые колонки известны заранее (схема плюс суффиксы
+    _device/_fstype), поэтому на горячем пути остаются только
+    поиск в таблице и подстановка значений — без ветвлений по типам.
+    """
+    formatter = _row_formatters.get(keys)
+    if formatter is None:
+        str_keys = {key for key, type_ in METRIC_SCHEMA.items() if type_ is str}
+        str_keys.update(key for key in keys if key.endswith(('_device', '_fstype')))
+        formatter = _build_row_formatter(keys, str_keys=str_keys,
+                                         nullable_keys={'cpu_freq_current'})
+        _row_formatters[keys] = formatter
+    return formatter
+
+# Прямое чтение /proc вместо обёрток psutil: дескрипторы открываем один
+# раз при импорте и перечитываем через pread(offset=0) без open/close
+# на каждом цикле. Вне Linux остаемся на psutil.
+_MEMINFO_FD = None
+_LOADAVG_FD = None
+if sys.platform == 'linux':
+    try:
+        _MEMINFO_FD = os.open('/proc/meminfo', os.O_RDONLY)
+        _LOADAVG_FD = os.open('/proc/loadavg', os.O_RDONLY)
+    except OSError:
+        _MEMINFO_FD = None
+        _LOADAVG_FD = None
+
+# Структуры, совместимые по полям с psutil.virtual_memory/swap_memory
+MemoryStats = namedtuple('MemoryStats', ['total', 'available', 'used', 'percent'])
+SwapStats = namedtuple('SwapStats', ['total', 'used', 'percent'])
+
+def get_memory_stats():
+    """Метрики памяти и swap из /proc/meminfo одним pread
+
+    Разбираем только нужные строки key: value (значения в кБ).
+    Формулы used/percent повторяют psutil.
+    """
+    if _MEMINFO_FD is None:
+        return psutil.virtual_memory(), psutil.swap_memory()
+
+    fields = {}
+    for line in os.pread(_MEMINFO_FD, 16384, 0).decode().splitlines():
+        key, _, rest = line.partition(':')
+        fields[key] = int(rest.split()[0]) * 1024
+
+    total = fields['MemTotal']
+    available = fields.get('MemAvailable', fields['MemFree'])
+    used = total - available  # как в psutil начиная с ядра 4.4
+    percent = round(used * 100.0 / total, 1) if total > 0 else 0.0
+
+    swap_total = fields.get('SwapTotal', 0)
+    swap_used = swap_total - fields.get('SwapFree', 0)
+    swap_percent = round(swap_used * 100.0 / swap_total, 1) if swap_total > 0 else 0.0
+
+    return (MemoryStats(total, available, used, percent),
+            SwapStats(swap_total, swap_used, swap_percent))
+
+def get_load_avg():
+    """Средняя загрузка из /proc/loadavg одним pread"""
+    if _LOADAVG_FD is None:
+        return psutil.getloadavg()
+
+    parts = os.pread(_LOADAVG_FD, 128, 0).split()
+    return float(parts[0]), float(parts[1]), float(parts[2])
+
+# Таблица монтирования меняется редко — кэшируем список разделов
+PARTITIONS_CACHE_TTL = 30.0
+_partitions_cache = None
+_partitions_cache_time = 0.0
+
+def get_partitions():
+    """Список разделов с кэшированием (TTL 30 секунд)
+
+    Пересканировать таблицу монтирования на каждом цикле незачем:
+    разделы появляются и исчезают редко.
+    """
+    global _partitions_cache, _partitions_cache_time
+
+    now = time.monotonic()
+    if _partitions_cache is None or now - _partitions_cache_time > PARTITIONS_CACHE_TTL:
+        _partitions_cache = psutil.disk_partitions(all=False)
+        _partitions_cache_time = now
+
+    return _partitions_cache
+
+@functools.lru_cache(maxsize=256)
+def _sanitize_mount(mountpoint):
+    """Безопасное имя колонки CSV из точки монтирования (мемоизировано)
+
+    Любой символ вне [A-Za-z0-9_] заменяется на подчеркивание: имена
+    колонок попадают в сгенерированный код форматтера строки, поэтому
+    кавычки, скобки и прочая экзотика из automount-меток недопустимы.
+    """
+    mount_name = re.sub(r'[^A-Za-z0-9_]', '_', mountpoint).strip('_')
+    return mount_name or 'root'  # пустое имя — корневой раздел
+
+@functools.lru_cache(maxsize=256)
+def _disk_metric_keys(mount_name):
+    """Готовый кортеж имен колонок для диска (мемоизировано)
+
+    Избавляет collect_metrics() от шести f-строк на раздел на каждом цикле.
+    """
+    return tuple(f'disk_{mount_name}_{suffix}' for suffix in DISK_KEY_SUFFIXES)
+
+@functools.lru_cache(maxsize=256)
+def _device_basename(device):
+    """Имя устройства без пути (мемоизировано)"""
+    return os.path.basename(device)
+
+def get_disk_usage(mountpoint):
+    """Статистика использования раздела одним вызовом statvfs
+
+    Прямой os.statvfs() вместо psutil.disk_usage() — те же цифры
+    (psutil считает их из тех же полей), но без лишнего слоя обёрток.
+    """
+    st = os.statvfs(mountpoint)
+    total = st.f_blocks * st.f_frsize
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    free = st.f_bavail * st.f_frsize
+    percent = round(used * 100.0 / (used + free), 1) if used + free > 0 else 0.0
+    return total, used, free, percent
+
+# Дисковая таблица в SoA-раскладке: по списку на поле вместо словаря
+# на раздел. Потребители читают колонки по индексу раздела.
+DiskTable = namedtuple('DiskTable', [
+    'mount_names', 'mountpoints', 'devices', 'fstypes',
+    'totals_gb', 'useds_gb', 'frees_gb', 'percents',
+])
+
+_EMPTY_DISK_TABLE = DiskTable([], [], [], [], [], [], [], [])
+
+# Запись об одном разделе: фиксированная структура вместо словаря —
+# компактнее в памяти и с доступом по атрибуту вместо поиска по ключу
+DiskInfo = namedtuple('DiskInfo', [
+    'mount_name', 'mountpoint', 'device', 'fstype',
+    'total_gb', 'used_gb', 'free_gb', 'percent',
+])
+
+def iter_disk_info(disks):
+    """Ленивый обход таблицы разделов записями DiskInfo
+
+    Записи создаются только когда потребителю (human-формату) нужен
+    построчный вид; путь сбора метрик работает с колонками напрямую.
+    """
+    for row in zip(*disks):
+        yield DiskInfo(*row)
 
 def get_disk_metrics():
-    """Получение детальной информации о дисках"""
-    disk_metrics = {}
-    
-    # Получаем список всех разделов
-    partitions = psutil.disk_partitions(all=False)  # all=False исключает специальные файловые системы
-    
+    """Получение детальной информации о дисках
+
+    Возвращает кортеж (disks, total_size, total_used): таблицу разделов
+    в SoA-раскладке и суммарные байты по физическим дискам, накопленные
+    здесь же, чтобы не делать отдельный проход в collect_metrics().
+    """
+    entries = []
+    total_size = 0
+    total_used = 0
+
+    # Получаем список всех разделов (из кэша)
+    partitions = get_partitions()  # all=False исключает специальные файловые системы
+
     for partition in partitions:
         # Пропускаем специальные файловые системы
-        if partition.fstype in ['tmpfs', 'devtmpfs', 'squashfs', 'overlay', 'proc', 'sysfs', 'cgroup']:
+        if partition.fstype in _SKIP_FSTYPES:
             continue
-        
+
         try:
-            usage = psutil.disk_usage(partition.mountpoint)
-            
-            # Создаем безопасное имя для CSV колонки
-            mount_name = partition.mountpoint.replace('/', '_').replace('.', '_').strip('_')
-            if not mount_name:  # для корневого раздела
-                mount_name = 'root'
-            
-            # Получаем имя устройства без пути
-            device_name = os.path.basename(partition.device)
-            
-            disk_metrics[mount_name] = {
-                'mountpoint': partition.mountpoint,
-                'device': device_name,
-                'fstype': partition.fstype,
-                'total_gb': round(usage.total / (1024**3), 2),
-                'used_gb': round(usage.used / (1024**3), 2),
-                'free_gb': round(usage.free / (1024**3), 2),
-                'percent': round(usage.percent, 2),
-                'total_bytes': usage.total,
-                'used_bytes': usage.used,
-                'free_bytes': usage.free
-            }
-            
+            total, used, free, percent = get_disk_usage(partition.mountpoint)
+
+            # Имена не меняются между циклами — берем из кэша
+            mount_name = _sanitize_mount(partition.mountpoint)
+            device_name = _device_basename(partition.device)
+
+            entries.append((mount_name, partition.mountpoint, device_name,
+                            partition.fstype, total, used, free, round(percent, 2)))
+
+            # Суммируем общий объем сразу (физические диски, а не overlay/loop)
+            if partition.fstype not in _VIRTUAL_FSTYPES:
+                total_size += total
+                total_used += used
+
         except (PermissionError, FileNotFoundError):
             # Пропускаем разделы без доступа
             continue
         except Exception as e:
             print(f"Error reading {partition.mountpoint}: {e}", file=sys.stderr)
             continue
-    
-    return disk_metrics
+
+    if not entries:
+        return _EMPTY_DISK_TABLE, total_size, total_used
+
+    # Разворачиваем записи в параллельные колонки
+    mount_names, mountpoints, devices, fstypes, totals, useds, frees, percents = \
+        map(list, zip(*entries))
+
+    # Переводим байты в гигабайты одним векторным проходом по всем разделам
+    raw_bytes = np.array([totals, useds, frees], dtype=np.float64)
+    totals_gb, useds_gb, frees_gb = _convert_bytes(raw_bytes, INV_GB).tolist()
+
+    disks = DiskTable(mount_names, mountpoints, devices, fstypes,
+                      totals_gb, useds_gb, frees_gb, percents)
+    return disks, total_size, total_used
 
 def collect_metrics():
-    """Сбор всех системных метрик"""
+    """Сбор всех системных метрик
+
+    Возвращает кортеж (metrics, disks), чтобы потребителям
+    не приходилось повторно опрашивать диски.
+    """
     
-    # Время сбора
-    timestamp = datetime.now().isoformat()
+    # Время сбора: time.strftime по кэшированному time.time() дешевле,
+    # чем создание и форматирование объекта datetime
+    now = time.time()
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)) \
+        + f'.{int(now % 1.0 * 1e6):06d}'
     
-    # CPU метрики
-    cpu_percent = psutil.cpu_percent(interval=1, percpu=False)
-    cpu_percent_per_core = psutil.cpu_percent(interval=1, percpu=True)
-    cpu_count = psutil.cpu_count()
+    # CPU метрики: в режиме цикла — последнее значение фонового сэмплера,
+    # иначе дельта от предыдущего вызова (без блокирующего сна)
+    cpu_percent_per_core = []
+    if _cpu_sampler_started:
+        with _cpu_lock:
+            cpu_percent = _cpu_state['total']
+            cpu_percent_per_core = _cpu_state['per_core']
+    if not cpu_percent_per_core:
+        # Сэмплер еще не завершил первый замер (или не запущен) —
+        # берем дельту от затравочного вызова, а не нулевую заглушку
+        cpu_percent = psutil.cpu_percent(interval=None, percpu=False)
+        cpu_percent_per_core = psutil.cpu_percent(interval=None, percpu=True)
     cpu_freq = psutil.cpu_freq()
     
-    # RAM метрики
-    memory = psutil.virtual_memory()
-    swap = psutil.swap_memory()
+    # RAM метрики (прямое чтение /proc/meminfo на Linux)
+    memory, swap = get_memory_stats()
     
-    # Дисковые метрики
-    disk_metrics = get_disk_metrics()
+    # Дисковые метрики (суммарные байты накоплены внутри)
+    disks, total_disk_size, total_disk_used = get_disk_metrics()
     disk_io = psutil.disk_io_counters()
     
     # Сетевая статистика
     net_io = psutil.net_io_counters()
     
-    # Загрузка системы
-    load_avg = psutil.getloadavg()
+    # Загрузка системы (прямое чтение /proc/loadavg на Linux)
+    load_avg = get_load_avg()
     
     # Процессы
     process_count = len(psutil.pids())
-    
+
+    # Все байтовые метрики переводим одним векторным проходом
+    raw_bytes = np.array([
+        memory.total, memory.available, memory.used,
+        swap.total, swap.used,
+        disk_io.read_bytes, disk_io.write_bytes,
+        net_io.bytes_sent, net_io.bytes_recv,
+    ], dtype=np.float64)
+    (memory_total_gb, memory_available_gb, memory_used_gb,
+     swap_total_gb, swap_used_gb,
+     disk_io_read_mb, disk_io_write_mb,
+     net_mb_sent, net_mb_recv) = _convert_bytes(raw_bytes, _BYTE_FACTORS).tolist()
+
     # Собираем все метрики в словарь
     metrics = {
         'timestamp': timestamp,
-        'hostname': socket.gethostname(),
+        'hostname': get_hostname(),
         
         # CPU
         'cpu_percent': round(cpu_percent, 2),
-        'cpu_count': cpu_count,
+        'cpu_count': CPU_COUNT,
         'cpu_freq_current': round(cpu_freq.current, 2) if cpu_freq else None,
         'load_1min': round(load_avg[0], 2),
         'load_5min': round(load_avg[1], 2),
         'load_15min': round(load_avg[2], 2),
         
         # Память (в гигабайтах для удобства)
-        'memory_total_gb': round(memory.total / (1024**3), 2),
-        'memory_available_gb': round(memory.available / (1024**3), 2),
-        'memory_used_gb': round(memory.used / (1024**3), 2),
+        'memory_total_gb': memory_total_gb,
+        'memory_available_gb': memory_available_gb,
+        'memory_used_gb': memory_used_gb,
         'memory_percent': round(memory.percent, 2),
-        'swap_total_gb': round(swap.total / (1024**3), 2) if swap.total > 0 else 0,
-        'swap_used_gb': round(swap.used / (1024**3), 2) if swap.total > 0 else 0,
+        'swap_total_gb': swap_total_gb if swap.total > 0 else 0,
+        'swap_used_gb': swap_used_gb if swap.total > 0 else 0,
         'swap_percent': round(swap.percent, 2) if swap.total > 0 else 0,
-        
+
         # Дисковая статистика IO
-        'disk_io_read_mb': round(disk_io.read_bytes / (1024**2), 2),
-        'disk_io_write_mb': round(disk_io.write_bytes / (1024**2), 2),
-        
+        'disk_io_read_mb': disk_io_read_mb,
+        'disk_io_write_mb': disk_io_write_mb,
+
         # Сетевая статистика
-        'net_mb_sent': round(net_io.bytes_sent / (1024**2), 2),
-        'net_mb_recv': round(net_io.bytes_recv / (1024**2), 2),
+        'net_mb_sent': net_mb_sent,
+        'net_mb_recv': net_mb_recv,
         
         # Процессы
         'process_count': process_count,
     }
     
-    # Добавляем метрики по каждому диску
-    total_disk_used = 0
-    total_disk_size = 0
-    
-    for mount_name, disk_info in disk_metrics.items():
-        # Основные метрики в гигабайтах
-        metrics[f'disk_{mount_name}_total_gb'] = disk_info['total_gb']
-        metrics[f'disk_{mount_name}_used_gb'] = disk_info['used_gb']
-        metrics[f'disk_{mount_name}_free_gb'] = disk_info['free_gb']
-        metrics[f'disk_{mount_name}_percent'] = disk_info['percent']
-        
-        # Дополнительные метрики для детального анализа
-        metrics[f'disk_{mount_name}_device'] = disk_info['device']
-        metrics[f'disk_{mount_name}_fstype'] = disk_info['fstype']
-        
-        # Суммируем для общего объема (если это физические диски, а не overlay/loop)
-        if not any(x in disk_info['fstype'] for x in ['overlay', 'squashfs']):
-            total_disk_used += disk_info['used_bytes']
-            total_disk_size += disk_info['total_bytes']
-    
+    # Добавляем метрики по каждому диску (имена колонок — из кэша,
+    # значения — из SoA-колонок по индексу раздела)
+    for i, mount_name in enumerate(disks.mount_names):
+        total_key, used_key, free_key, percent_key, device_key, fstype_key = \
+            _disk_metric_keys(mount_name)
+        metrics[total_key] = disks.totals_gb[i]
+        metrics[used_key] = disks.useds_gb[i]
+        metrics[free_key] = disks.frees_gb[i]
+        metrics[percent_key] = disks.percents[i]
+        metrics[device_key] = disks.devices[i]
+        metrics[fstype_key] = disks.fstypes[i]
+
     # Общая статистика по всем дискам
     if total_disk_size > 0:
-        metrics['disk_total_all_gb'] = round(total_disk_size / (1024**3), 2)
-        metrics['disk_used_all_gb'] = round(total_disk_used / (1024**3), 2)
+        metrics['disk_total_all_gb'] = round(total_disk_size * INV_GB, 2)
+        metrics['disk_used_all_gb'] = round(total_disk_used * INV_GB, 2)
         metrics['disk_percent_all'] = round((total_disk_used / total_disk_size) * 100, 2)
     
     # Количество обнаруженных дисков
-    metrics['disk_count'] = len(disk_metrics)
-    
-    return metrics
+    metrics['disk_count'] = len(disks.mount_names)
+
+    return metrics, disks
+
+def _disk_header_keys():
+    """Имена дисковых колонок из таблицы монтирования (без statvfs)"""
+    keys = []
+
+    for partition in get_partitions():
+        if partition.fstype in _SKIP_FSTYPES:
+            continue
+
+        keys.extend(_disk_metric_keys(_sanitize_mount(partition.mountpoint)))
+
+    keys.extend(('disk_total_all_gb', 'disk_used_all_gb', 'disk_percent_all', 'disk_count'))
+    return keys
+
+def _static_header_keys():
+    """Имена фиксированных колонок из статической схемы"""
+    return list(METRIC_SCHEMA)
+
+def render_csv_header():
+    """Заголовок CSV для pandas
+
+    Строится из статической схемы и таблицы монтирования — без единого
+    вызова collect_metrics(), statvfs или замера CPU.
+    """
+    return ','.join(_static_header_keys() + _disk_header_keys())
+
+def render_csv_row():
+    """Строка CSV с метриками"""
+    metrics, _ = collect_metrics()
+
+    # Вся строка форматируется одной скомпилированной f-строкой,
+    # подобранной по фактическому набору колонок
+    return _get_row_formatter(tuple(metrics))(metrics)
 
 def print_csv_header():
     """Вывод заголовка CSV для pandas"""
-    metrics = collect_metrics()
-    print(','.join(metrics.keys()))
+    sys.stdout.write(render_csv_header() + '\n')
 
 def print_csv_row():
     """Вывод строки CSV с метриками"""
-    metrics = collect_metrics()
-    
-    # Форматируем значения для CSV
-    row_values = []
-    for key, value in metrics.items():
-        if value is None:
-            row_values.append('')
-        elif isinstance(value, str) and ',' in value:
-            # Экранируем запятые в строках
-            row_values.append(f'"{value}"')
-        elif isinstance(value, (int, float)):
-            row_values.append(str(value))
-        else:
-            row_values.append(str(value))
-    
-    print(','.join(row_values))
+    sys.stdout.write(render_csv_row() + '\n')
+
+def render_human_readable():
+    """Отчет в удобочитаемом формате"""
+    metrics, disks = collect_metrics()
+
+    # Собираем отчет в список строк: один write() вместо ~25 print()
+    parts = []
+
+    parts.append(f"\n{'='*60}")
+    parts.append(f"System Metrics Report - {metrics['timestamp']}")
+    parts.append(f"{'='*60}")
+
+    parts.append(f"\n📊 CPU Usage:")
+    parts.append(f"  Overall: {metrics['cpu_percent']}%")
+    parts.append(f"  Load Average: {metrics['load_1min']:.2f}, {metrics['load_5min']:.2f}, {metrics['load_15min']:.2f}")
+
+    parts.append(f"\n🧠 Memory:")
+    parts.append(f"  Used: {metrics['memory_used_gb']:.1f} GB / {metrics['memory_total_gb']:.1f} GB ({metrics['memory_percent']}%)")
+    parts.append(f"  Available: {metrics['memory_available_gb']:.1f} GB")
+
+    if metrics['swap_total_gb'] > 0:
+        parts.append(f"  Swap: {metrics['swap_used_gb']:.1f} GB / {metrics['swap_total_gb']:.1f} GB ({metrics['swap_percent']}%)")
+
+    parts.append(f"\n💾 Disk Usage:")
+    for info in iter_disk_info(disks):
+        parts.append(f"  {info.mountpoint}:")
+        parts.append(f"    Used: {info.used_gb:.1f} GB / {info.total_gb:.1f} GB ({info.percent}%)")
+        parts.append(f"    Free: {info.free_gb:.1f} GB")
+        parts.append(f"    Type: {info.device} ({info.fstype})")
+
+    parts.append(f"\n📈 Disk IO:")
+    parts.append(f"  Read: {metrics['disk_io_read_mb']:.1f} MB")
+    parts.append(f"  Write: {metrics['disk_io_write_mb']:.1f} MB")
+
+    parts.append(f"\n🌐 Network:")
+    parts.append(f"  Sent: {metrics['net_mb_sent']:.1f} MB")
+    parts.append(f"  Received: {metrics['net_mb_recv']:.1f} MB")
+
+    parts.append(f"\n🔢 System:")
+    parts.append(f"  Processes: {metrics['process_count']}")
+    parts.append(f"  Disks: {metrics['disk_count']}")
+
+    parts.append(f"\n{'='*60}")
+
+    return '\n'.join(parts)
 
 def print_human_readable():
     """Вывод в удобочитаемом формате"""
-    metrics = collect_metrics()
-    disk_metrics = get_disk_metrics()
-    
-    print(f"\n{'='*60}")
-    print(f"System Metrics Report - {metrics['timestamp']}")
-    print(f"{'='*60}")
-    
-    print(f"\n📊 CPU Usage:")
-    print(f"  Overall: {metrics['cpu_percent']}%")
-    print(f"  Load Average: {metrics['load_1min']:.2f}, {metrics['load_5min']:.2f}, {metrics['load_15min']:.2f}")
-    
-    print(f"\n🧠 Memory:")
-    print(f"  Used: {metrics['memory_used_gb']:.1f} GB / {metrics['memory_total_gb']:.1f} GB ({metrics['memory_percent']}%)")
-    print(f"  Available: {metrics['memory_available_gb']:.1f} GB")
-    
-    if metrics['swap_total_gb'] > 0:
-        print(f"  Swap: {metrics['swap_used_gb']:.1f} GB / {metrics['swap_total_gb']:.1f} GB ({metrics['swap_percent']}%)")
-    
-    print(f"\n💾 Disk Usage:")
-    for mount_name, disk_info in disk_metrics.items():
-        mountpoint = disk_info['mountpoint']
-        print(f"  {mountpoint}:")
-        print(f"    Used: {disk_info['used_gb']:.1f} GB / {disk_info['total_gb']:.1f} GB ({disk_info['percent']}%)")
-        print(f"    Free: {disk_info['free_gb']:.1f} GB")
-        print(f"    Type: {disk_info['device']} ({disk_info['fstype']})")
-    
-    print(f"\n📈 Disk IO:")
-    print(f"  Read: {metrics['disk_io_read_mb']:.1f} MB")
-    print(f"  Write: {metrics['disk_io_write_mb']:.1f} MB")
-    
-    print(f"\n🌐 Network:")
-    print(f"  Sent: {metrics['net_mb_sent']:.1f} MB")
-    print(f"  Received: {metrics['net_mb_recv']:.1f} MB")
-    
-    print(f"\n🔢 System:")
-    print(f"  Processes: {metrics['process_count']}")
-    print(f"  Disks: {metrics['disk_count']}")
-    
-    print(f"\n{'='*60}")
+    sys.stdout.write(render_human_readable() + '\n')
+
+def render_json():
+    """Метрики в формате JSON"""
+    metrics, _ = collect_metrics()
+    return _json_dumps(metrics)
 
 def print_json():
     """Вывод в формате JSON"""
-    metrics = collect_metrics()
-    print(json.dumps(metrics, indent=2))
+    sys.stdout.write(render_json() + '\n')
+
+# Рендеры по имени формата — общие для CLI и сокет-сервера
+RENDERERS = {
+    'header': render_csv_header,
+    'csv': render_csv_row,
+    'json': render_json,
+    'human': render_human_readable,
+}
+
+def run_server(sock_path):
+    """Постоянный сборщик метрик за unix-сокетом
+
+    Процесс держит все кэши и прогретое состояние cpu_percent, а клиенты
+    получают готовую строку за миллисекунды вместо ~200 мс старта
+    интерпретатора плюс секунды замера CPU на каждый запуск.
+    """
+    import socket
+
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(sock_path)
+    server.listen()
+
+    start_cpu_sampler()
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                # Таймаут, чтобы молчащий клиент не завесил сборщик,
+                # а битый запрос не уронил весь сервер
+                conn.settimeout(1.0)
+                try:
+                    request = conn.recv(64).decode().strip() or 'csv'
+                    reply = RENDERERS.get(request, render_csv_row)()
+                except Exception as e:
+                    reply = f'Error collecting metrics: {e}'
+                try:
+                    conn.sendall(reply.encode() + b'\n')
+                except OSError:
+                    pass  # клиент отвалился — обслуживаем следующих
+    finally:
+        server.close()
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+
+def run_client(sock_path, format_name):
+    """Тонкий клиент: запрашивает формат у сервера и печатает ответ"""
+    import socket
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(sock_path)
+    with client:
+        client.sendall(format_name.encode() + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        reply = bytearray()
+        while chunk := client.recv(65536):
+            reply.extend(chunk)
+    sys.stdout.write(reply.decode())
+
+def _handle_sigterm(signum, frame):
+    """Аккуратное завершение демона по SIGTERM"""
+    sys.exit(0)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='System Metrics Collector')
-    parser.add_argument('--format', choices=['csv', 'json', 'header', 'human'], 
+    parser.add_argument('--format', choices=['csv', 'json', 'header', 'human'],
                        default='human', help='Output format')
-    parser.add_argument('--once', action='store_true', 
+    parser.add_argument('--once', action='store_true',
                        help='Collect once and exit')
-    
+    parser.add_argument('--interval', type=float, default=1.0,
+                       help='Seconds between samples in loop mode')
+    parser.add_argument('--server', metavar='SOCKPATH',
+                       help='Run as a persistent collector behind a unix socket')
+    parser.add_argument('--client', metavar='SOCKPATH',
+                       help='Query a running collector instead of sampling locally')
+
     args = parser.parse_args()
-    
+
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
+    emit = {
+        'json': print_json,
+        'human': print_human_readable,
+    }.get(args.format, print_csv_row)
+
     try:
+        if args.server:
+            time.sleep(CPU_SAMPLE_INTERVAL)  # первый рабочий замер CPU
+            run_server(args.server)
+            sys.exit(0)
+
+        if args.client:
+            run_client(args.client, args.format)
+            sys.exit(0)
+
+        # Заголовку не нужны ни метрики, ни замер CPU — печатаем и выходим
         if args.format == 'header':
             print_csv_header()
-        elif args.format == 'json':
-            print_json()
-        elif args.format == 'human':
-            print_human_readable()
-        else:
-            print_csv_row()
-        
-        if not args.once:
             sys.exit(0)
-            
+
+        if not args.once:
+            start_cpu_sampler()
+
+        # Один сон между затравочным замером (при импорте) и рабочим —
+        # вместо двух блокирующих вызовов по секунде внутри collect_metrics()
+        time.sleep(CPU_SAMPLE_INTERVAL)
+
+        # Без --once процесс живет долго: старт интерпретатора, импорт psutil
+        # и прогрев cpu_percent оплачиваются один раз, а не на каждый замер
+        while True:
+            emit()
+            if args.once:
+                break
+            sys.stdout.flush()
+            time.sleep(args.interval)
+
+    except KeyboardInterrupt:
+        sys.exit(0)
     except Exception as e:
         print(f"Error collecting metrics: {e}", file=sys.stderr)
         sys.exit(1)
\ No newline at end of file